@@ -3,13 +3,85 @@ Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
 """
 import asyncio
 import ssl as ssl_
+import weakref
 from typing import Callable, Dict, Optional, Union
 
 from aiodeluge.protocol import DelugeRPCProtocol
 from aiodeluge.request import DelugeRPCRequest
 
+_default_ssl: Optional[ssl_.SSLContext] = None
+# context -> {(host, port): session}, a session can only be resumed by the
+# context that negotiated it
+_sessions = weakref.WeakKeyDictionary()
+
+
+def _get_default_ssl() -> ssl_.SSLContext:
+    """
+    The context is shared by every Client that does not bring its own, so that
+    TLS sessions negotiated by one client can be resumed by the next one.
+    """
+    global _default_ssl
+    if _default_ssl is None:
+        sslcontext = ssl_.SSLContext(ssl_.PROTOCOL_TLS_CLIENT)
+        sslcontext.options |= ssl_.OP_NO_SSLv2
+        sslcontext.options |= ssl_.OP_NO_SSLv3
+        sslcontext.check_hostname = False
+        sslcontext.verify_mode = ssl_.CERT_NONE
+        sslcontext.set_default_verify_paths()
+        _default_ssl = sslcontext
+    return _default_ssl
+
+
+class _ResumingContext:
+    """
+    Wraps an SSLContext so the handshake asyncio performs offers a
+    previously negotiated session, asyncio itself has no way to pass one.
+    """
+
+    def __init__(self, context: ssl_.SSLContext, session: ssl_.SSLSession):
+        self._context = context
+        self._session = session
+
+    def wrap_bio(
+        self, incoming, outgoing, server_side=False, server_hostname=None, session=None
+    ):
+        try:
+            return self._context.wrap_bio(
+                incoming,
+                outgoing,
+                server_side=server_side,
+                server_hostname=server_hostname,
+                session=session or self._session,
+            )
+        except ValueError:
+            # the session belongs to another context, do a full handshake instead
+            return self._context.wrap_bio(
+                incoming,
+                outgoing,
+                server_side=server_side,
+                server_hostname=server_hostname,
+            )
+
+    def __getattr__(self, item):
+        return getattr(self._context, item)
+
 
 class Client:
+    """
+    A connection to deluged.
+
+    When ``username`` is given, connect() logs in by itself, sending
+    ``daemon.login`` and ``daemon.info`` in one message, so there is no need
+    to call ``daemon.login`` by hand.
+
+    Without ``ssl``, every Client uses the same module-wide SSLContext, which
+    lets them resume each other's TLS sessions. Modifying ``client.ssl`` then
+    affects all of them, pass your own context if you need to change it.
+
+    ``session`` is only offered when it was negotiated by ``ssl``, a session
+    from another context is ignored and a full handshake is done instead.
+    """
+
     def __init__(
         self,
         host: str = "127.0.0.1",
@@ -19,47 +91,152 @@ class Client:
         event_handlers: Optional[Dict[str, Callable]] = None,
         ssl: Optional[ssl_.SSLContext] = None,
         timeout: Optional[Union[int, float]] = None,
+        session: Optional[ssl_.SSLSession] = None,
+        client_version: Optional[str] = "2.1.1",
     ):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         if ssl is None:
-            sslcontext = ssl_.SSLContext(ssl_.PROTOCOL_TLS_CLIENT)
-            sslcontext.options |= ssl_.OP_NO_SSLv2
-            sslcontext.options |= ssl_.OP_NO_SSLv3
-            sslcontext.check_hostname = False
-            sslcontext.verify_mode = ssl_.CERT_NONE
-            sslcontext.set_default_verify_paths()
-            self.ssl = sslcontext
+            self.ssl = _get_default_ssl()
         else:
             self.ssl = ssl
+        self.session = session
+        self._session_context: Optional[ssl_.SSLContext] = None
+        self.client_version = client_version
         if event_handlers is None:
             self.event_handlers = {}
         self._loop = asyncio.get_running_loop()
         self._protocol: DelugeRPCProtocol = None
+        self._transport: asyncio.Transport = None
+        self._connecting: Optional[asyncio.Task] = None
         self.connected: bool = False
+        self.auth_level: Optional[int] = None
+        self.daemon_version: Optional[str] = None
         self._request_counter = 0
         if timeout is None:
             self._timeout = 5
         else:
             self._timeout = timeout
 
+    def warmup(self) -> asyncio.Task:
+        """
+        Start connecting (and logging in) in the background, a later
+        connect() or ``async with`` only waits for what is left of it.
+        """
+        if self._connecting is None:
+            self._connecting = self._loop.create_task(self._connect())
+            self._connecting.add_done_callback(self._retrieve_exception)
+        return self._connecting
+
+    @staticmethod
+    def _retrieve_exception(task: asyncio.Task):
+        # a warmup nobody awaits must not log "Task exception was never retrieved",
+        # connect() raises it again anyway
+        if not task.cancelled():
+            task.exception()
+
     async def connect(self):
-        if not self._protocol and not self.connected:
-            _, protocol = await self._loop.create_connection(
-                lambda: DelugeRPCProtocol(self.event_handlers),
-                self.host,
-                self.port,
-                ssl=self.ssl,
-            )
-            self._protocol = protocol
-            self.connected = True
+        started = self._connecting is None
+        connecting = self.warmup()
+        try:
+            await asyncio.shield(connecting)
+        except asyncio.CancelledError:
+            if self._connecting is not connecting:  # disconnect() was called meanwhile
+                raise ConnectionError("Client disconnected while connecting")
+            if started:
+                # only a warmup() outlives its caller, don't leak this connection
+                self._connecting = None
+                connecting.cancel()
+                await asyncio.gather(connecting, return_exceptions=True)
+            raise
+        except BaseException:
+            if self._connecting is connecting:
+                self._connecting = None
+            raise
 
-    async def disconnect(self):
+    async def _connect(self):
+        if self._protocol or self.connected:
+            return
+        ssl = self.ssl
+        session = self.session
+        if self._session_context is not None and self._session_context is not self.ssl:
+            session = None  # client.ssl was replaced since
+        if session is None:
+            session = _sessions.get(self.ssl, {}).get((self.host, self.port))
+        if session is not None:
+            ssl = _ResumingContext(self.ssl, session)
+        transport, protocol = await self._loop.create_connection(
+            lambda: DelugeRPCProtocol(self.event_handlers),
+            self.host,
+            self.port,
+            ssl=ssl,
+        )
+        self._transport = transport
+        self._protocol = protocol
+        self.connected = True
+        if self.username:
+            try:
+                await self._login()
+            except BaseException:
+                await self._close()
+                raise
+        self._save_session()
+
+    async def _login(self):
+        # daemon.info rides along in the same message as daemon.login, so the
+        # login costs a single round trip
+        kwargs = {}
+        if self.client_version is not None:
+            kwargs["client_version"] = self.client_version
+        self.auth_level, self.daemon_version = await self._protocol.send_requests(
+            [
+                self._make_request(
+                    "daemon.login", (self.username, self.password), kwargs
+                ),
+                self._make_request("daemon.info", (), {}),
+            ],
+            self.timeout,
+        )
+
+    def _save_session(self):
+        """Remember the TLS session so the next connection can resume it"""
+        if self._transport is None:
+            return
+        ssl_object = self._transport.get_extra_info("ssl_object")
+        if ssl_object is None or ssl_object.session is None:
+            return
+        self.session = ssl_object.session
+        self._session_context = self.ssl
+        _sessions.setdefault(self.ssl, {})[(self.host, self.port)] = self.session
+
+    @property
+    def session_reused(self) -> bool:
+        """Whether the current connection resumed a previous TLS session"""
+        if self._transport is None:
+            return False
+        ssl_object = self._transport.get_extra_info("ssl_object")
+        return ssl_object is not None and ssl_object.session_reused
+
+    async def _close(self):
         await self._protocol.close()
         self.connected = False
         self._protocol = None
+        self._transport = None
+        self.auth_level = None
+        self.daemon_version = None
+
+    async def disconnect(self):
+        connecting, self._connecting = self._connecting, None
+        if connecting is not None:
+            if not connecting.done():
+                connecting.cancel()
+            await asyncio.gather(connecting, return_exceptions=True)
+        if self._protocol is None:
+            return
+        self._save_session()
+        await self._close()
 
     @property
     def timeout(self):
@@ -69,16 +246,18 @@ class Client:
     def timeout(self, v):
         self._timeout = v
 
+    def _make_request(self, method: str, args: tuple, kwargs: dict):
+        request = DelugeRPCRequest()
+        request.request_id = self._request_counter
+        request.method = method
+        request.args = args
+        request.kwargs = kwargs
+        self._request_counter += 1
+        return request
+
     async def send_request(self, method: str, *args, **kwargs):
-        try:
-            request = DelugeRPCRequest()
-            request.request_id = self._request_counter
-            request.method = method
-            request.args = args
-            request.kwargs = kwargs
-            return await self._protocol.send_request(request, self.timeout)
-        finally:
-            self._request_counter += 1
+        request = self._make_request(method, args, kwargs)
+        return await self._protocol.send_request(request, self.timeout)
 
     async def __aenter__(self):
         await self.connect()
@@ -6,7 +6,7 @@ import struct
 
 # https://deluge.readthedocs.io/en/latest/reference/rpc.html
 import zlib
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 import rencode
 
@@ -302,5 +302,37 @@ class DelugeRPCProtocol(DelugeTransferProtocol):
         finally:
             del self._waiters[request.request_id]
 
+    async def send_requests(self, requests: List[DelugeRPCRequest], timeout: int = 5):
+        """
+        Sends several RPCRequests to the server in a single message, so they
+        share one round trip. The daemon handles them in order.
+        :param requests: list of RPCRequest
+        :returns: a list with the result of each request, in the same order
+        """
+        loop = asyncio.get_running_loop()
+        waiters = []
+        try:
+            for request in requests:
+                waiter = loop.create_future()
+                self._waiters[request.request_id] = waiter
+                waiters.append(waiter)
+            await self.transfer_message(
+                tuple(request.format_message() for request in requests)
+            )
+            _, pending = await asyncio.wait(waiters, timeout=timeout)
+            if pending:
+                raise asyncio.TimeoutError
+            for waiter in waiters:
+                if waiter.exception() is not None:
+                    raise waiter.exception()
+            return [waiter.result() for waiter in waiters]
+        finally:
+            for request, waiter in zip(requests, waiters):
+                del self._waiters[request.request_id]
+                if waiter.done():
+                    waiter.exception()  # don't log the ones not raised above
+                else:
+                    waiter.cancel()
+
     def num_pending_tasks(self):
         return len(self._tasks)
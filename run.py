@@ -14,12 +14,9 @@ async def evhandle(*args):
 
 
 async def main():
-    async with Client(timeout=10) as client:  # DelugeRPCProtocol.dispatch break here
-        print(
-            await client.send_request(
-                "daemon.login", "synodriver", "123456", client_version="2.1.1"
-            )
-        )
+    async with Client(
+        username="synodriver", password="123456", timeout=10
+    ) as client:  # DelugeRPCProtocol.dispatch break here
         print(await client.send_request("core.get_auth_levels_mappings"))
         print(await client.send_request("core.get_external_ip"))
         print(await client.send_request("core.get_config"))
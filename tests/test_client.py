@@ -0,0 +1,281 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import asyncio
+import gc
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+from aiodeluge import Client
+from aiodeluge.exception import BadLoginError
+from aiodeluge.protocol import RPC_ERROR, RPC_RESPONSE, DelugeTransferProtocol
+
+
+class FakeDaemon(DelugeTransferProtocol):
+    """Answers like deluged does, recording every message it gets"""
+
+    def __init__(self, messages, delay=0):
+        super().__init__()
+        self.messages = messages
+        self.delay = delay
+
+    def message_received(self, message):
+        self.messages.append(message)
+        for request_id, method, args, kwargs in message:
+            if method == "daemon.login":
+                if args != ("user", "pass") or "client_version" not in kwargs:
+                    response = (
+                        RPC_ERROR,
+                        request_id,
+                        "BadLoginError",
+                        ("Password does not match", args[0]),
+                        {},
+                        "",
+                    )
+                else:
+                    response = (RPC_RESPONSE, request_id, 10)
+            elif method == "daemon.info":
+                response = (RPC_RESPONSE, request_id, "2.1.1")
+            else:
+                response = (RPC_RESPONSE, request_id, method)
+            asyncio.get_running_loop().call_later(self.delay, self.respond, response)
+
+    def respond(self, response):
+        if self.transport is not None:
+            asyncio.ensure_future(self.transfer_message(response))
+
+
+@pytest.fixture(scope="module")
+def server_ssl(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is needed to create a certificate")
+    path = tmp_path_factory.mktemp("ssl")
+    cert, key = str(path / "daemon.cert"), str(path / "daemon.pkey")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes"]
+        + ["-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=deluge"],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def client_ssl():
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def run_with_daemon(server_ssl, test, delay=0):
+    async def main():
+        messages = []
+        server = await asyncio.get_running_loop().create_server(
+            lambda: FakeDaemon(messages, delay), "127.0.0.1", 0, ssl=server_ssl
+        )
+        port = server.sockets[0].getsockname()[1]
+        try:
+            await test(port, messages)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+
+
+def test_login_is_pipelined(server_ssl):
+    async def test(port, messages):
+        async with Client(
+            port=port, username="user", password="pass", ssl=client_ssl()
+        ) as client:
+            assert client.auth_level == 10
+            assert client.daemon_version == "2.1.1"
+            assert [request[1] for request in messages[0]] == [
+                "daemon.login",
+                "daemon.info",
+            ]
+            assert await client.send_request("core.get_config") == "core.get_config"
+        assert client.auth_level is None
+        assert client.daemon_version is None
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_no_login_without_username(server_ssl):
+    async def test(port, messages):
+        async with Client(port=port, ssl=client_ssl()) as client:
+            assert client.auth_level is None
+            assert await client.send_request("core.get_config") == "core.get_config"
+        assert len(messages) == 1
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_bad_login_closes_connection(server_ssl):
+    async def test(port, messages):
+        client = Client(port=port, username="user", password="bad", ssl=client_ssl())
+        with pytest.raises(BadLoginError):
+            await client.connect()
+        assert not client.connected
+        assert client._transport is None
+        assert client.auth_level is None
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_session_is_resumed(server_ssl):
+    async def test(port, messages):
+        context = client_ssl()
+        async with Client(
+            port=port, username="user", password="pass", ssl=context
+        ) as client:
+            assert not client.session_reused
+        async with Client(
+            port=port, username="user", password="pass", ssl=context
+        ) as client:
+            assert client.session_reused
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_sessions_are_kept_per_context(server_ssl):
+    async def test(port, messages):
+        first, second = client_ssl(), client_ssl()
+        for context in (first, second):
+            async with Client(port=port, username="user", password="pass", ssl=context):
+                pass
+        for context in (first, second):
+            async with Client(
+                port=port, username="user", password="pass", ssl=context
+            ) as client:
+                assert client.session_reused
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_foreign_session_is_ignored(server_ssl):
+    async def test(port, messages):
+        async with Client(
+            port=port, username="user", password="pass", ssl=client_ssl()
+        ) as client:
+            session = client.session
+        async with Client(
+            port=port,
+            username="user",
+            password="pass",
+            ssl=client_ssl(),
+            session=session,
+        ) as other:
+            assert not other.session_reused
+
+        client.ssl = client_ssl()
+        async with client:
+            assert not client.session_reused
+        async with client:
+            assert client.session_reused
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_warmup(server_ssl):
+    async def test(port, messages):
+        client = Client(port=port, username="user", password="pass", ssl=client_ssl())
+        await client.warmup()
+        assert client.connected
+        async with client:
+            assert len(messages) == 1
+            assert client.auth_level == 10
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_failed_warmup_is_retrieved(server_ssl):
+    async def test(port, messages):
+        unhandled = []
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+        client = Client(port=1, username="user", password="pass", ssl=client_ssl())
+        task = client.warmup()
+        await asyncio.wait([task])
+        await client.disconnect()
+
+        dropped = Client(port=1, username="user", password="pass", ssl=client_ssl())
+        task = dropped.warmup()
+        await asyncio.wait([task])
+        del dropped, task
+        gc.collect()
+        assert unhandled == []
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_disconnect_during_connect(server_ssl):
+    async def test(port, messages):
+        client = Client(port=port, username="user", password="pass", ssl=client_ssl())
+        connecting = asyncio.ensure_future(client.connect())
+        await asyncio.sleep(0)
+        await client.disconnect()
+        with pytest.raises(ConnectionError):
+            await connecting
+        assert not client.connected
+        await client.connect()
+        assert client.connected
+        await client.disconnect()
+
+    run_with_daemon(server_ssl, test)
+
+
+def test_disconnect_during_warmup(server_ssl):
+    async def test(port, messages):
+        client = Client(port=port, username="user", password="pass", ssl=client_ssl())
+        warming = client.warmup()
+        connecting = asyncio.ensure_future(client.connect())
+        await asyncio.sleep(0.05)
+        assert not warming.done()
+        await client.disconnect()
+        assert warming.cancelled()
+        with pytest.raises(ConnectionError):
+            await connecting
+        assert not client.connected
+        assert client._transport is None
+
+    run_with_daemon(server_ssl, test, delay=0.3)
+
+
+def test_cancelled_connect_closes_connection(server_ssl):
+    async def test(port, messages):
+        client = Client(port=port, username="user", password="pass", ssl=client_ssl())
+
+        async def job():
+            async with client:
+                pass
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(job(), 0.1)
+        assert not client.connected
+        assert client._transport is None
+        await asyncio.sleep(0.4)  # the daemon's answer arrives meanwhile
+        assert not client.connected
+        assert client._transport is None
+        assert client.auth_level is None
+
+    run_with_daemon(server_ssl, test, delay=0.3)
+
+
+def test_cancelled_connect_keeps_warmup(server_ssl):
+    async def test(port, messages):
+        client = Client(port=port, username="user", password="pass", ssl=client_ssl())
+        client.warmup()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.connect(), 0.1)
+        await client.connect()
+        assert client.connected
+        assert client.auth_level == 10
+        await client.disconnect()
+
+    run_with_daemon(server_ssl, test, delay=0.3)